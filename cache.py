@@ -0,0 +1,46 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+# Location of the persistent response cache
+CACHE_DIR = os.path.join(".", ".resume_cache")
+CACHE_PATH = os.path.join(CACHE_DIR, "responses.sqlite3")
+
+# One connection is shared by every session; Streamlit runs each session's script
+# on its own thread, so access to it is serialized with a lock
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
+    """Return the shared cache connection, opening the database on first use."""
+    global _conn
+    if _conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        _conn = conn
+    return _conn
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """Return the cached value for a key, or None if it is not cached."""
+    try:
+        with _lock:
+            row = _connect().execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        # The cache is best-effort; treat an unreadable cache as a miss
+        return None
+    return json.loads(row[0]) if row else None
+
+def set(key: str, value: Dict[str, Any]) -> None:
+    """Store a value in the cache under the given key."""
+    try:
+        with _lock, _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)",
+                (key, json.dumps(value))
+            )
+    except sqlite3.Error:
+        # Failing to cache a response should never fail the extraction itself
+        pass
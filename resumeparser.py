@@ -1,11 +1,28 @@
 import streamlit as st
 import openai
-import json
+import asyncio
+import hashlib
+import orjson
 import pandas as pd
 import io
+import logging
 import PyPDF2
 import pdfplumber
-from typing import List, Dict, Any
+import pymupdf
+import tiktoken
+from aiolimiter import AsyncLimiter
+from openai.types.chat import ChatCompletionSystemMessageParam
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from itertools import chain
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple, Union
+import cache
+
+logger = logging.getLogger(__name__)
 
 # Set page configuration
 st.set_page_config(
@@ -19,122 +36,693 @@ if 'processed_data' not in st.session_state:
     st.session_state.processed_data = []
 if 'api_key_set' not in st.session_state:
     st.session_state.api_key_set = False
+if 'pdf_text_cache' not in st.session_state:
+    st.session_state.pdf_text_cache = {}
+if 'pdf_details_cache' not in st.session_state:
+    st.session_state.pdf_details_cache = {}
+if 'results_memos' not in st.session_state:
+    st.session_state.results_memos = {}
 
-def extract_applicant_details(resume_text: str, client) -> Dict[str, Any]:
-    """Extract details from a given resume text using OpenAI API."""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a resume-parsing assistant."},
-                {"role": "user", "content": f"Extract the name, email, skills, and years of experience from this resume:\n\n{resume_text}"}
-            ],
-            functions=[
-                {
-                    "name": "extract_details",
-                    "description": "Extract applicant details from a resume",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "name": {"type": "string"},
-                            "email": {"type": "string"},
-                            "skills": {"type": "array", "items": {"type": "string"}},
-                            "experience_years": {"type": "number"}
-                        },
-                        "required": ["name", "email", "skills", "experience_years"]
-                    }
-                }
-            ],
-            function_call={"name": "extract_details"}
+# Maximum number of concurrent OpenAI requests for batch processing
+MAX_CONCURRENT_REQUESTS = 10
+
+# Default number of prompt tokens per minute the batch paths may send to OpenAI
+DEFAULT_TPM_BUDGET = 200_000
+
+# Maximum number of resume tokens sent to OpenAI; longer resumes are truncated
+MAX_RESUME_TOKENS = 4000
+
+# Rough token size used when the tokenizer cannot be loaded
+CHARS_PER_TOKEN = 4
+
+# Retries of rate-limited or failed batch requests, and the wait used when OpenAI gives no Retry-After
+MAX_REQUEST_RETRIES = 3
+DEFAULT_RETRY_AFTER = 1.0
+
+# OpenAI errors worth retrying after waiting for the Retry-After interval
+RETRYABLE_API_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# OpenAI errors caused by the API key rather than the resume, raised instead of reported per resume
+ACCESS_API_ERRORS = (openai.AuthenticationError, openai.PermissionDeniedError)
+
+# Number of threads extracting PDF text. PyMuPDF is single-threaded and holds the GIL,
+# so one worker is enough to keep extraction off the event loop
+MAX_EXTRACTION_WORKERS = 1
+
+# Number of resumes sent to OpenAI in a single batched request
+BATCH_SIZE = 5
+
+# Number of PDF pages read by default; contact details are almost always on the first pages
+DEFAULT_MAX_PAGES = 3
+
+# Extracted values treated as "not found" when deciding whether to read the whole PDF
+MISSING_VALUES = {"", "n/a", "na", "none", "unknown", "not found", "not provided"}
+
+# Maximum number of entries kept in each per-session PDF cache
+SESSION_CACHE_SIZE = 50
+
+# Number of progress updates sent to the browser while processing a batch
+PROGRESS_UPDATES = 20
+
+# Maximum number of CSV rows that can be processed in one batch
+MAX_CSV_ROWS = 20
+
+# Column types of the results table
+RESULT_DTYPES = {
+    "name": "string",
+    "email": "string",
+    "skills": "object",
+    "experience_years": "float64",
+    "source_file": "string"
+}
+
+@dataclass(slots=True, frozen=True)
+class Resume:
+    """Applicant details extracted from a single resume."""
+    name: str
+    email: str
+    skills: Tuple[str, ...]
+    experience_years: float
+    source_file: Optional[str] = None
+    
+    @classmethod
+    def from_details(cls, details: Dict[str, Any]) -> "Resume":
+        """Build a Resume from the details returned by OpenAI."""
+        return cls(
+            name=details["name"],
+            email=details["email"],
+            skills=tuple(details["skills"]),
+            experience_years=float(details["experience_years"])
         )
-        return json.loads(response.choices[0].message.function_call.arguments)
+
+# Models offered for extraction, the first being the default
+MODELS = ["gpt-4o-mini", "gpt-4o"]
+DEFAULT_MODEL = MODELS[0]
+
+# Prompt version, part of the response cache key along with the model
+PROMPT_VERSION = "v2"
+
+def resume_cache_key(content: Union[str, bytes], model: str = DEFAULT_MODEL) -> str:
+    """Build the response cache key for a resume text or raw PDF bytes."""
+    if isinstance(content, str):
+        content = content.encode()
+    elif not isinstance(content, bytes):
+        raise TypeError(f"Expected resume text or PDF bytes, got {type(content).__name__}")
+    return hashlib.sha256(f"{model}|{PROMPT_VERSION}|".encode() + content).hexdigest()
+
+def get_cached_details(key: str, use_cache: bool = True) -> Optional[Resume]:
+    """Return the details cached on disk under a key, or None on a miss or when caching is off."""
+    if not use_cache:
+        return None
+    cached = cache.get(key)
+    return Resume.from_details(cached) if cached is not None else None
+
+def cache_details(key: str, details: Optional[Resume], use_cache: bool = True) -> None:
+    """Store extracted details on disk under a key when caching is on."""
+    if use_cache and details:
+        cache.set(key, asdict(details))
+
+# JSON schema of the details extracted from one resume
+DETAILS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "email": {"type": "string"},
+        "skills": {"type": "array", "items": {"type": "string"}},
+        "experience_years": {"type": "number"}
+    },
+    "required": ["name", "email", "skills", "experience_years"],
+    "additionalProperties": False
+}
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """Return the tokenizer used by a model, or None if it cannot be loaded."""
+    try:
+        encoding_name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        encoding_name = "o200k_base"
+    
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        # tiktoken downloads its vocabularies on first use, which fails when offline
+        return None
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens in a text, approximating when the tokenizer is unavailable."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text))
+
+@lru_cache(maxsize=None)
+def count_fixed_tokens(text: str, model: str) -> int:
+    """Count the tokens in a fixed part of the prompt, tokenizing it only once per model."""
+    return count_tokens(text, model)
+
+def truncate_to_token_budget(text: str, model: str, max_tokens: int = MAX_RESUME_TOKENS) -> Tuple[str, int]:
+    """Truncate a resume to at most ``max_tokens`` tokens, returning it with its token count."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        truncated = text[:max_tokens * CHARS_PER_TOKEN]
+        num_tokens = len(truncated) // CHARS_PER_TOKEN + 1
+    else:
+        tokens = encoding.encode(text)
+        truncated = encoding.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else text
+        num_tokens = min(len(tokens), max_tokens)
+    
+    if len(truncated) < len(text):
+        logger.warning("Resume truncated to %d tokens (%d of %d characters kept)", max_tokens, len(truncated), len(text))
+    return truncated, num_tokens
+
+# Request parts shared by every extraction call, built once at import time
+EXTRACT_SYSTEM = "You are a resume-parsing assistant."
+EXTRACT_SYSTEM_MESSAGE: ChatCompletionSystemMessageParam = {"role": "system", "content": EXTRACT_SYSTEM}
+EXTRACT_INSTRUCTION = "Extract the name, email, skills, and years of experience from this resume:\n\n"
+BATCH_EXTRACT_INSTRUCTION = (
+    "Extract the name, email, skills, and years of experience from each of these resumes. "
+    "Return exactly one result per resume, in the same order, and set resume_index "
+    "to the number of the resume it was extracted from:\n\n"
+)
+BATCH_RESUME_SEPARATOR = "\n---\n"
+
+EXTRACT_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "extract_details",
+        "description": "Extract applicant details from a resume",
+        "schema": DETAILS_SCHEMA,
+        "strict": True
+    }
+}
+
+# Batched results also carry the number of the resume they belong to
+BATCH_DETAILS_SCHEMA = {
+    **DETAILS_SCHEMA,
+    "properties": {"resume_index": {"type": "integer"}, **DETAILS_SCHEMA["properties"]},
+    "required": ["resume_index", *DETAILS_SCHEMA["required"]]
+}
+
+BATCH_EXTRACT_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "extract_details_batch",
+        "description": "Extract applicant details from several resumes",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {"type": "array", "items": BATCH_DETAILS_SCHEMA}
+            },
+            "required": ["results"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+def build_extraction_request(resume_text: str, model: str = DEFAULT_MODEL) -> Tuple[Dict[str, Any], int]:
+    """Build the chat completion request used to extract details from a resume.
+
+    Returns the request along with an estimate of its prompt tokens.
+    """
+    resume_text, num_tokens = truncate_to_token_budget(resume_text, model)
+    request = {
+        "model": model,
+        "messages": [
+            EXTRACT_SYSTEM_MESSAGE,
+            {"role": "user", "content": f"{EXTRACT_INSTRUCTION}{resume_text}"}
+        ],
+        "response_format": EXTRACT_SCHEMA
+    }
+    num_tokens += count_fixed_tokens(EXTRACT_SYSTEM, model) + count_fixed_tokens(EXTRACT_INSTRUCTION, model)
+    return request, num_tokens
+
+def build_batch_extraction_request(resume_texts: List[str], model: str = DEFAULT_MODEL) -> Tuple[Dict[str, Any], int]:
+    """Build a chat completion request extracting details from several resumes at once.
+
+    Returns the request along with an estimate of its prompt tokens.
+    """
+    resumes = []
+    num_tokens = count_fixed_tokens(EXTRACT_SYSTEM, model) + count_fixed_tokens(BATCH_EXTRACT_INSTRUCTION, model)
+    for i, text in enumerate(resume_texts, 1):
+        header = f"Resume {i}:\n"
+        text, text_tokens = truncate_to_token_budget(text, model)
+        resumes.append(f"{header}{text}")
+        num_tokens += text_tokens + count_fixed_tokens(header, model) + count_fixed_tokens(BATCH_RESUME_SEPARATOR, model)
+    
+    request = {
+        "model": model,
+        "messages": [
+            EXTRACT_SYSTEM_MESSAGE,
+            {"role": "user", "content": BATCH_EXTRACT_INSTRUCTION + BATCH_RESUME_SEPARATOR.join(resumes)}
+        ],
+        "response_format": BATCH_EXTRACT_SCHEMA
+    }
+    return request, num_tokens
+
+def parse_response(response) -> Any:
+    """Parse the structured output of a chat completion."""
+    message = response.choices[0].message
+    if message.refusal:
+        raise ValueError(f"The model refused the request: {message.refusal}")
+    return orjson.loads(message.content)
+
+def retry_after_seconds(error: openai.APIError) -> float:
+    """Return how long OpenAI asked us to wait before retrying a request."""
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        # Retry-After may also be an HTTP date, which we don't bother parsing
+        pass
+    return DEFAULT_RETRY_AFTER
+
+async def create_completion(client, request: Dict[str, Any], num_tokens: int, limiter: AsyncLimiter):
+    """Send a chat completion request, charging its estimated prompt tokens to the rate limiter.
+
+    Rate-limited and failed requests are retried after the Retry-After interval given by OpenAI.
+    """
+    tokens = min(num_tokens, limiter.max_rate)
+    for attempt in range(MAX_REQUEST_RETRIES + 1):
+        await limiter.acquire(tokens)
+        try:
+            return await client.chat.completions.create(**request)
+        except RETRYABLE_API_ERRORS as e:
+            if attempt == MAX_REQUEST_RETRIES:
+                raise
+            await asyncio.sleep(retry_after_seconds(e))
+
+def is_valid_details(details: Any) -> bool:
+    """Check that an extraction result contains every required field."""
+    return isinstance(details, dict) and all(field in details for field in DETAILS_SCHEMA["required"])
+
+def is_valid_batch(batch_results: Any, num_resumes: int) -> bool:
+    """Check that a batched response holds one valid result per resume, in input order."""
+    return (
+        isinstance(batch_results, list)
+        and len(batch_results) == num_resumes
+        and all(map(is_valid_details, batch_results))
+        and [details.get("resume_index") for details in batch_results] == list(range(1, num_resumes + 1))
+    )
+
+def extract_applicant_details(resume_text: str, client, use_cache: bool = True, model: str = DEFAULT_MODEL) -> Optional[Resume]:
+    """Extract details from a given resume text using OpenAI API.
+
+    Responses are cached under a hash of the model and resume text.
+    """
+    key = resume_cache_key(resume_text, model)
+    cached = get_cached_details(key, use_cache)
+    if cached is not None:
+        return cached
+    
+    try:
+        request, _ = build_extraction_request(resume_text, model)
+        response = client.chat.completions.create(**request)
+        details = Resume.from_details(parse_response(response))
     except Exception as e:
         st.error(f"Error extracting details: {str(e)}")
         return None
+    
+    cache_details(key, details, use_cache)
+    return details
+
+async def extract_applicant_details_async(resume_text: str, client, sem: asyncio.Semaphore, limiter: AsyncLimiter, use_cache: bool = True, model: str = DEFAULT_MODEL) -> Optional[Resume]:
+    """Extract details from a given resume text using the async OpenAI client."""
+    key = resume_cache_key(resume_text, model)
+    cached = get_cached_details(key, use_cache)
+    if cached is not None:
+        return cached
+    
+    async with sem:
+        try:
+            request, num_tokens = build_extraction_request(resume_text, model)
+            response = await create_completion(client, request, num_tokens, limiter)
+            details = Resume.from_details(parse_response(response))
+        except ACCESS_API_ERRORS:
+            raise
+        except Exception as e:
+            st.error(f"Error extracting details: {str(e)}")
+            return None
+    
+    cache_details(key, details, use_cache)
+    return details
+
+async def extract_applicant_details_batch(resume_texts: List[str], client, sem: asyncio.Semaphore, limiter: AsyncLimiter, use_cache: bool = True, model: str = DEFAULT_MODEL) -> List[Optional[Resume]]:
+    """Extract details from several resumes with a single OpenAI request.
+
+    Cached resumes are left out of the request. If the batched request fails or its
+    response does not hold one valid result per resume, tagged with that resume's
+    number, each resume is retried with its own request. Errors caused by the API key
+    are raised instead, since retrying each resume would fail too.
+    """
+    keys = [resume_cache_key(text, model) for text in resume_texts]
+    results = [get_cached_details(key, use_cache) for key in keys]
+    pending = [i for i, details in enumerate(results) if details is None]
+    if len(pending) <= 1:
+        for i in pending:
+            results[i] = await extract_applicant_details_async(resume_texts[i], client, sem, limiter, use_cache, model)
+        return results
+    
+    batch_results = None
+    async with sem:
+        try:
+            request, num_tokens = build_batch_extraction_request([resume_texts[i] for i in pending], model)
+            response = await create_completion(client, request, num_tokens, limiter)
+            batch_results = parse_response(response)["results"]
+        except ACCESS_API_ERRORS:
+            raise
+        except (openai.APIError, ValueError, KeyError, TypeError, IndexError):
+            # A bad request may come from a single resume, so failed or malformed
+            # responses are handled below by falling back to one request per resume
+            pass
+    
+    if is_valid_batch(batch_results, len(pending)):
+        for i, details in zip(pending, batch_results):
+            results[i] = Resume.from_details(details)
+            cache_details(keys[i], results[i], use_cache)
+    else:
+        fallback_results = await asyncio.gather(*(
+            extract_applicant_details_async(resume_texts[i], client, sem, limiter, use_cache, model)
+            for i in pending
+        ))
+        for i, details in zip(pending, fallback_results):
+            results[i] = details
+    return results
+
+def should_update_progress(done: int, previous: int, total: int) -> bool:
+    """Check whether progress has moved past one of the PROGRESS_UPDATES steps."""
+    step = max(1, total // PROGRESS_UPDATES)
+    return done == total or done // step > previous // step
 
-def process_single_resume(resume_text: str, client) -> Dict[str, Any]:
+async def _with_index(index: int, coro):
+    """Await a coroutine and tag its result with the index of its input."""
+    return index, await coro
+
+def process_single_resume(resume_text: str, client, use_cache: bool = True, model: str = DEFAULT_MODEL) -> Optional[Resume]:
     """Process a single resume text."""
-    return extract_applicant_details(resume_text, client)
+    return extract_applicant_details(resume_text, client, use_cache, model)
+
+def needs_full_document(details: Optional[Resume]) -> bool:
+    """Check whether the name or email was missing from the pages read so far."""
+    if details is None:
+        return False
+    return any(value.strip().lower() in MISSING_VALUES for value in (details.name, details.email))
+
+def extract_text_from_pdf(pdf_file, max_pages: Optional[int] = DEFAULT_MAX_PAGES) -> str:
+    """Extract text from uploaded PDF file using multiple methods for better accuracy.
 
-def extract_text_from_pdf(pdf_file) -> str:
-    """Extract text from uploaded PDF file using multiple methods for better accuracy."""
+    Only the first ``max_pages`` pages are read; pass None to read the whole document.
+    """
     try:
-        # Method 1: Try pdfplumber first (better for complex layouts)
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        # Method 1: Try PyMuPDF first (fastest, preserves reading order)
+        pdf_file.seek(0)
+        with pymupdf.open(stream=pdf_file.read(), filetype="pdf") as doc:
+            text = "\n".join(page.get_text("text") for page in doc.pages(0, max_pages))
         
         if text.strip():
             return text
         
-        # Method 2: Fallback to PyPDF2 if pdfplumber fails
+        # Method 2: Fallback to pdfplumber (better for complex layouts)
         pdf_file.seek(0)  # Reset file pointer
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        pages = list(range(1, max_pages + 1)) if max_pages else None
+        with pdfplumber.open(pdf_file, pages=pages) as pdf:
+            page_texts = (page.extract_text() for page in pdf.pages)
+            text = "".join(f"{page_text}\n" for page_text in page_texts if page_text)
         
-        return text
+        if text.strip():
+            return text
+        
+        # Method 3: Fallback to PyPDF2 if pdfplumber fails
+        pdf_file.seek(0)  # Reset file pointer
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return "".join(f"{page.extract_text()}\n" for page in pdf_reader.pages[:max_pages])
     
     except Exception as e:
         st.error(f"Error extracting text from PDF: {str(e)}")
         return ""
 
-def process_multiple_pdfs(pdf_files: List, client) -> List[Dict[str, Any]]:
-    """Process multiple PDF files."""
-    extracted_details = []
+def session_cache_set(session_cache: Dict, key: Any, value: Any) -> None:
+    """Store a value in a per-session cache, evicting the oldest entry once it is full."""
+    session_cache[key] = value
+    if len(session_cache) > SESSION_CACHE_SIZE:
+        del session_cache[next(iter(session_cache))]
+
+def extract_text_cached(pdf_bytes: bytes, pdf_key: str, max_pages: Optional[int] = DEFAULT_MAX_PAGES) -> str:
+    """Extract text from PDF bytes, reusing text already extracted in this session."""
+    text = st.session_state.pdf_text_cache.get((pdf_key, max_pages))
+    if text is None:
+        text = extract_text_from_pdf(io.BytesIO(pdf_bytes), max_pages)
+        session_cache_set(st.session_state.pdf_text_cache, (pdf_key, max_pages), text)
+    return text
+
+def process_single_pdf(pdf_bytes: bytes, client, use_cache: bool = True, model: str = DEFAULT_MODEL) -> Tuple[Optional[Resume], str]:
+    """Extract details from a single PDF, returning them with the text they were extracted from.
+
+    PDFs whose name or email is not on their first pages are re-read in full and sent again.
+    The text is empty when the details come from the disk cache, since the PDF is not read.
+    """
+    # One key for the session and disk caches; keying on the PDF bytes lets cached files skip text extraction
+    pdf_key = resume_cache_key(pdf_bytes, model)
+    if use_cache:
+        # Session hits also keep the text the details were extracted from for the preview
+        details, resume_text = st.session_state.pdf_details_cache.get(pdf_key, (None, ""))
+        if details is not None:
+            return details, resume_text
+        cached = get_cached_details(pdf_key)
+        if cached is not None:
+            return cached, ""
     
-    # Create progress bar
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    resume_text = extract_text_cached(pdf_bytes, pdf_key)
+    if not resume_text.strip():
+        return None, resume_text
     
-    for i, pdf_file in enumerate(pdf_files):
-        status_text.text(f'Processing PDF {i+1} of {len(pdf_files)}: {pdf_file.name}')
-        progress_bar.progress((i + 1) / len(pdf_files))
-        
-        # Extract text from PDF
-        resume_text = extract_text_from_pdf(pdf_file)
-        
+    details = process_single_resume(resume_text, client, use_cache, model)
+    # Re-read the whole document if the contact details were not on the first pages
+    if needs_full_document(details):
+        full_text = extract_text_cached(pdf_bytes, pdf_key, max_pages=None)
+        if len(full_text) > len(resume_text):
+            full_details = process_single_resume(full_text, client, use_cache, model)
+            if full_details:
+                resume_text, details = full_text, full_details
+    
+    if details:
+        cache_details(pdf_key, details, use_cache)
+        session_cache_set(st.session_state.pdf_details_cache, pdf_key, (details, resume_text))
+    return details, resume_text
+
+async def process_pdf_batch_async(pdf_files: List, client, sem: asyncio.Semaphore, limiter: AsyncLimiter, executor: ThreadPoolExecutor, use_cache: bool = True, model: str = DEFAULT_MODEL) -> List[Optional[Resume]]:
+    """Extract text from a batch of PDFs on the extraction thread, then send them to OpenAI in one request.
+
+    PDFs whose name or email is not on their first pages are re-read in full and sent again.
+    """
+    loop = asyncio.get_running_loop()
+    resume_texts = await asyncio.gather(*(
+        loop.run_in_executor(executor, extract_text_from_pdf, pdf_file) for pdf_file in pdf_files
+    ))
+    
+    results = [None] * len(pdf_files)
+    readable = []
+    for i, (pdf_file, resume_text) in enumerate(zip(pdf_files, resume_texts)):
         if resume_text.strip():
-            details = extract_applicant_details(resume_text, client)
-            if details:
-                details['source_file'] = pdf_file.name  # Add source file info
-                extracted_details.append(details)
+            readable.append(i)
         else:
             st.warning(f"⚠️ Could not extract text from {pdf_file.name}")
     
-    status_text.text('PDF processing complete!')
-    return extracted_details
+    if readable:
+        batch_results = await extract_applicant_details_batch(
+            [resume_texts[i] for i in readable],
+            client,
+            sem,
+            limiter,
+            use_cache,
+            model
+        )
+        for i, details in zip(readable, batch_results):
+            results[i] = details
+    
+    # Re-read the whole document when the contact details were not on the first pages
+    incomplete = [i for i in readable if needs_full_document(results[i])]
+    full_texts = await asyncio.gather(*(
+        loop.run_in_executor(executor, extract_text_from_pdf, pdf_files[i], None) for i in incomplete
+    ))
+    retries = [(i, text) for i, text in zip(incomplete, full_texts) if len(text) > len(resume_texts[i])]
+    retry_results = await asyncio.gather(*(
+        extract_applicant_details_async(text, client, sem, limiter, use_cache, model) for _, text in retries
+    ))
+    for (i, _), details in zip(retries, retry_results):
+        if details:
+            results[i] = details
+    return results
 
-def process_resumes_from_dataframe(df: pd.DataFrame, client, num_rows: int = 5) -> List[Dict[str, Any]]:
-    """Process multiple resumes from a DataFrame."""
-    extracted_details = []
+@asynccontextmanager
+async def openai_batch_session(api_key: str, max_concurrency: int = MAX_CONCURRENT_REQUESTS, tpm_budget: int = DEFAULT_TPM_BUDGET) -> AsyncIterator[Tuple[openai.AsyncOpenAI, asyncio.Semaphore, AsyncLimiter]]:
+    """Open the async OpenAI client, concurrency limit and rate limiter shared by one batch run.
+
+    Batch requests are retried by create_completion, which honours Retry-After. The client's
+    connections belong to the running event loop, so it is closed before asyncio.run returns.
+    """
+    async with openai.AsyncOpenAI(api_key=api_key, max_retries=0) as client:
+        yield client, asyncio.Semaphore(max_concurrency), AsyncLimiter(tpm_budget, 60)
+
+async def process_multiple_pdfs(pdf_files: List, api_key: str, max_concurrency: int = MAX_CONCURRENT_REQUESTS, use_cache: bool = True, model: str = DEFAULT_MODEL, tpm_budget: int = DEFAULT_TPM_BUDGET) -> List[Resume]:
+    """Process multiple PDF files, extracting text off the event loop and sending the OpenAI requests concurrently."""
+    # Create progress bar
+    progress_bar = st.progress(0)
+    status_text = st.empty()
     
+    results = [None] * len(pdf_files)
+    async with openai_batch_session(api_key, max_concurrency, tpm_budget) as (client, sem, limiter):
+        # The extraction thread inherits the script context so it can report extraction errors
+        with ThreadPoolExecutor(
+            max_workers=MAX_EXTRACTION_WORKERS,
+            initializer=add_script_run_ctx,
+            initargs=(None, get_script_run_ctx())
+        ) as executor:
+            uncached = []
+            keys = []
+            for i, pdf_file in enumerate(pdf_files):
+                # Key on the PDF bytes so cached files skip text extraction too
+                key = resume_cache_key(pdf_file.getvalue(), model)
+                cached = get_cached_details(key, use_cache)
+                if cached is not None:
+                    results[i] = replace(cached, source_file=pdf_file.name)
+                else:
+                    uncached.append(i)
+                    keys.append(key)
+            
+            # Send the uncached PDFs to OpenAI in batches of BATCH_SIZE
+            tasks = [
+                _with_index(start, process_pdf_batch_async(
+                    [pdf_files[i] for i in uncached[start:start + BATCH_SIZE]],
+                    client,
+                    sem,
+                    limiter,
+                    executor,
+                    use_cache,
+                    model
+                ))
+                for start in range(0, len(uncached), BATCH_SIZE)
+            ]
+            
+            # Collect results as they complete, keeping the original upload order
+            done = 0
+            for future in asyncio.as_completed(tasks):
+                start, batch_results = await future
+                previous, done = done, done + len(batch_results)
+                if should_update_progress(done, previous, len(uncached)):
+                    status_text.text(f'Processed PDF {done} of {len(uncached)}...')
+                    progress_bar.progress(done / len(uncached))
+                
+                for i, key, details in zip(uncached[start:start + BATCH_SIZE], keys[start:start + BATCH_SIZE], batch_results):
+                    if details:
+                        cache_details(key, details, use_cache)
+                        results[i] = replace(details, source_file=pdf_files[i].name)  # Add source file info
+    
+    progress_bar.progress(1.0)
+    status_text.text('PDF processing complete!')
+    return [details for details in results if details]
+
+async def process_resumes_from_dataframe(df: pd.DataFrame, api_key: str, num_rows: int = 5, max_concurrency: int = MAX_CONCURRENT_REQUESTS, use_cache: bool = True, model: str = DEFAULT_MODEL, tpm_budget: int = DEFAULT_TPM_BUDGET) -> List[Resume]:
+    """Process multiple resumes from a DataFrame, sending the OpenAI requests concurrently."""
     # Check if the required column exists
     if 'Resume_str' not in df.columns:
         st.error("The column 'Resume_str' was not found in the CSV file.")
         return []
     
     # Select the specified number of resumes
-    resumes = df['Resume_str'].head(num_rows).tolist()
+    resumes = df['Resume_str'].head(num_rows)
+    
+    # Empty cells are read as NaN, so skip them and treat any other values as text
+    num_empty = resumes.isna().sum()
+    if num_empty:
+        st.warning(f"⚠️ Skipped {num_empty} empty resume(s).")
+    resumes = resumes.dropna().astype(str)
     
     # Create progress bar
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for i, resume in enumerate(resumes):
-        status_text.text(f'Processing resume {i+1} of {len(resumes)}...')
-        progress_bar.progress((i + 1) / len(resumes))
+    async with openai_batch_session(api_key, max_concurrency, tpm_budget) as (client, sem, limiter):
+        # Send the resumes to OpenAI in batches of BATCH_SIZE
+        tasks = [
+            _with_index(start, extract_applicant_details_batch(resumes.iloc[start:start + BATCH_SIZE].tolist(), client, sem, limiter, use_cache, model=model))
+            for start in range(0, len(resumes), BATCH_SIZE)
+        ]
         
-        details = extract_applicant_details(resume, client)
-        if details:
-            extracted_details.append(details)
+        # Collect results as they complete, keeping the original row order
+        results = [None] * len(resumes)
+        done = 0
+        for future in asyncio.as_completed(tasks):
+            start, batch_results = await future
+            previous, done = done, done + len(batch_results)
+            if should_update_progress(done, previous, len(resumes)):
+                status_text.text(f'Processed resume {done} of {len(resumes)}...')
+                progress_bar.progress(done / len(resumes))
+            results[start:start + len(batch_results)] = batch_results
     
+    progress_bar.progress(1.0)
     status_text.text('Processing complete!')
-    return extracted_details
+    return [details for details in results if details]
+
+def build_results_df(records: List[Resume]) -> pd.DataFrame:
+    """Build the results table from extracted details using fixed column types."""
+    return pd.DataFrame(records, columns=list(RESULT_DTYPES)).astype(RESULT_DTYPES)
+
+def memoize_on_results(name: str, build: Callable[[], Any]) -> Any:
+    """Return a value derived from the processed results, rebuilding it only after results were added or cleared."""
+    # Results are only ever appended to or cleared, so their count identifies the data
+    num_results = len(st.session_state.processed_data)
+    memo = st.session_state.results_memos.get(name)
+    if memo is None or memo[0] != num_results:
+        memo = (num_results, build())
+        st.session_state.results_memos[name] = memo
+    return memo[1]
+
+def compute_summary_stats(results_df: pd.DataFrame) -> Dict[str, Any]:
+    """Compute the summary statistics shown in the Results tab."""
+    skill_lists = (skills for skills in results_df['skills'] if isinstance(skills, tuple))
+    skill_counts = Counter(chain.from_iterable(skill_lists))
+    return {
+        "avg_experience": results_df['experience_years'].mean(),
+        "total_candidates": len(results_df),
+        "most_common_skill": skill_counts.most_common(1)[0][0] if skill_counts else None
+    }
+
+def build_results_csv(results_df: pd.DataFrame) -> str:
+    """Serialize the results table to CSV."""
+    # Write skills as lists, matching the JSON export
+    csv_df = results_df.assign(skills=results_df['skills'].map(list))
+    return csv_df.to_csv(index=False)
+
+def get_openai_client(api_key: str) -> openai.OpenAI:
+    """Return the session's OpenAI client, creating a new one only when the API key changes.
+
+    Reusing the client across reruns keeps its HTTP/2 connections open.
+    """
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    if st.session_state.get('openai_key_hash') != key_hash:
+        if 'openai_client' in st.session_state:
+            st.session_state.openai_client.close()
+        st.session_state.openai_client = openai.OpenAI(
+            api_key=api_key,
+            http_client=openai.DefaultHttpxClient(http2=True)
+        )
+        st.session_state.openai_key_hash = key_hash
+    return st.session_state.openai_client
+
+def run_batch(batch) -> Optional[List[Resume]]:
+    """Run a batch processing coroutine, returning None if an OpenAI error stopped it."""
+    try:
+        return asyncio.run(batch)
+    except openai.OpenAIError as e:
+        # Errors such as an invalid key fail every resume, so report them once
+        st.error(f"❌ OpenAI request failed: {str(e)}")
+        return None
 
 def main():
     st.title("📄 CV Parser Application")
@@ -151,7 +739,7 @@ def main():
         
         if api_key:
             try:
-                client = openai.OpenAI(api_key=api_key)
+                client = get_openai_client(api_key)
                 st.success("✅ API Key set successfully!")
                 st.session_state.api_key_set = True
             except Exception as e:
@@ -160,11 +748,29 @@ def main():
         else:
             st.warning("⚠️ Please enter your OpenAI API key to continue.")
             st.session_state.api_key_set = False
+        
+        model = st.selectbox(
+            "Model:",
+            MODELS,
+            help="gpt-4o-mini is faster and cheaper; switch to gpt-4o when accuracy matters most."
+        )
+        
+        tpm_budget = st.number_input(
+            "Tokens per minute limit:",
+            min_value=1_000,
+            value=DEFAULT_TPM_BUDGET,
+            step=10_000,
+            help="Prompt tokens per minute batch processing may send, to stay within your OpenAI rate limit."
+        )
+        
+        use_cache = st.toggle(
+            "Use cache",
+            value=True,
+            help="Reuse stored results for resumes that have already been processed."
+        )
     
     # Main content area
     if st.session_state.api_key_set:
-        client = openai.OpenAI(api_key=api_key)
-        
         # Tab selection
         tab1, tab2, tab3, tab4, tab5 = st.tabs(["📝 Text Input", "📄 PDF Upload", "📊 Multiple PDFs", "📋 CSV Batch", "📈 Results"])
         
@@ -181,7 +787,7 @@ def main():
             if st.button("🔍 Extract Details", key="single_process"):
                 if resume_text.strip():
                     with st.spinner("Processing resume..."):
-                        details = process_single_resume(resume_text, client)
+                        details = process_single_resume(resume_text, client, use_cache, model=model)
                         if details:
                             st.success("✅ Resume processed successfully!")
                             
@@ -189,16 +795,15 @@ def main():
                             col1, col2 = st.columns(2)
                             with col1:
                                 st.subheader("📋 Extracted Information")
-                                st.write(f"**Name:** {details.get('name', 'N/A')}")
-                                st.write(f"**Email:** {details.get('email', 'N/A')}")
-                                st.write(f"**Experience:** {details.get('experience_years', 'N/A')} years")
+                                st.write(f"**Name:** {details.name}")
+                                st.write(f"**Email:** {details.email}")
+                                st.write(f"**Experience:** {details.experience_years} years")
                             
                             with col2:
                                 st.subheader("🛠️ Skills")
-                                skills = details.get('skills', [])
+                                skills = details.skills
                                 if skills:
-                                    for skill in skills:
-                                        st.write(f"• {skill}")
+                                    st.markdown("\n".join(f"- {skill}" for skill in skills))
                                 else:
                                     st.write("No skills extracted")
                             
@@ -221,48 +826,44 @@ def main():
                 st.success(f"✅ PDF uploaded: {uploaded_pdf.name}")
                 
                 # Show PDF info
-                st.info(f"📄 File size: {len(uploaded_pdf.getvalue()) / 1024:.1f} KB")
+                st.info(f"📄 File size: {uploaded_pdf.size / 1024:.1f} KB")
                 
                 if st.button("🔍 Extract from PDF", key="pdf_process"):
-                    with st.spinner("Extracting text from PDF..."):
-                        resume_text = extract_text_from_pdf(uploaded_pdf)
+                    with st.spinner("Processing PDF..."):
+                        details, resume_text = process_single_pdf(uploaded_pdf.getvalue(), client, use_cache, model)
+                    
+                    if resume_text.strip():
+                        st.success("✅ Text extracted successfully!")
                         
-                        if resume_text.strip():
-                            st.success("✅ Text extracted successfully!")
-                            
-                            # Show extracted text preview
-                            with st.expander("📄 View Extracted Text"):
-                                st.text_area("Extracted Text:", resume_text, height=200, disabled=True)
-                            
-                            # Process the extracted text
-                            with st.spinner("Processing resume with AI..."):
-                                details = process_single_resume(resume_text, client)
-                                if details:
-                                    details['source_file'] = uploaded_pdf.name
-                                    st.success("✅ Resume processed successfully!")
-                                    
-                                    # Display results
-                                    col1, col2 = st.columns(2)
-                                    with col1:
-                                        st.subheader("📋 Extracted Information")
-                                        st.write(f"**Name:** {details.get('name', 'N/A')}")
-                                        st.write(f"**Email:** {details.get('email', 'N/A')}")
-                                        st.write(f"**Experience:** {details.get('experience_years', 'N/A')} years")
-                                        st.write(f"**Source:** {details.get('source_file', 'N/A')}")
-                                    
-                                    with col2:
-                                        st.subheader("🛠️ Skills")
-                                        skills = details.get('skills', [])
-                                        if skills:
-                                            for skill in skills:
-                                                st.write(f"• {skill}")
-                                        else:
-                                            st.write("No skills extracted")
-                                    
-                                    # Add to session results
-                                    st.session_state.processed_data.append(details)
-                        else:
-                            st.error("❌ Could not extract text from PDF. Please try a different file.")
+                        # Show the text the details were extracted from
+                        with st.expander("📄 View Extracted Text"):
+                            st.text_area("Extracted Text:", resume_text, height=200, disabled=True)
+                    
+                    if details:
+                        details = replace(details, source_file=uploaded_pdf.name)
+                        st.success("✅ Resume processed successfully!")
+                        
+                        # Display results
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.subheader("📋 Extracted Information")
+                            st.write(f"**Name:** {details.name}")
+                            st.write(f"**Email:** {details.email}")
+                            st.write(f"**Experience:** {details.experience_years} years")
+                            st.write(f"**Source:** {details.source_file}")
+                        
+                        with col2:
+                            st.subheader("🛠️ Skills")
+                            skills = details.skills
+                            if skills:
+                                st.markdown("\n".join(f"- {skill}" for skill in skills))
+                            else:
+                                st.write("No skills extracted")
+                        
+                        # Add to session results
+                        st.session_state.processed_data.append(details)
+                    elif not resume_text.strip():
+                        st.error("❌ Could not extract text from PDF. Please try a different file.")
         
         with tab3:
             st.header("Multiple PDF Processing")
@@ -280,16 +881,17 @@ def main():
                 
                 # Show uploaded files
                 st.subheader("📁 Uploaded Files:")
-                for i, pdf in enumerate(uploaded_pdfs, 1):
-                    st.write(f"{i}. {pdf.name} ({len(pdf.getvalue()) / 1024:.1f} KB)")
+                st.markdown("\n".join(
+                    f"{i}. {pdf.name} ({pdf.size / 1024:.1f} KB)" for i, pdf in enumerate(uploaded_pdfs, 1)
+                ))
                 
                 if st.button("🚀 Process All PDFs", key="multiple_pdf_process"):
                     with st.spinner("Processing multiple PDFs..."):
-                        batch_results = process_multiple_pdfs(uploaded_pdfs, client)
+                        batch_results = run_batch(process_multiple_pdfs(uploaded_pdfs, api_key, use_cache=use_cache, model=model, tpm_budget=tpm_budget))
                         if batch_results:
                             st.session_state.processed_data.extend(batch_results)
                             st.success(f"✅ Successfully processed {len(batch_results)} out of {len(uploaded_pdfs)} PDFs!")
-                        else:
+                        elif batch_results is not None:
                             st.error("❌ Failed to process PDFs.")
         
         with tab4:
@@ -304,10 +906,11 @@ def main():
             
             if uploaded_file is not None:
                 try:
-                    # Read the uploaded file
-                    df = pd.read_csv(uploaded_file)
+                    # Read only as many rows as can be processed, plus one to detect larger files
+                    df = pd.read_csv(uploaded_file, nrows=MAX_CSV_ROWS + 1)
                     
-                    st.success(f"✅ File uploaded successfully! Found {len(df)} resumes.")
+                    found = f"more than {MAX_CSV_ROWS}" if len(df) > MAX_CSV_ROWS else len(df)
+                    st.success(f"✅ File uploaded successfully! Found {found} resumes.")
                     
                     # Show preview
                     st.subheader("📊 Data Preview")
@@ -317,17 +920,24 @@ def main():
                     num_rows = st.slider(
                         "Number of resumes to process:",
                         min_value=1,
-                        max_value=min(len(df), 20),
+                        max_value=min(len(df), MAX_CSV_ROWS),
                         value=min(5, len(df))
                     )
                     
                     if st.button("🚀 Process Batch", key="batch_process"):
                         with st.spinner("Processing batch..."):
-                            batch_results = process_resumes_from_dataframe(df, client, num_rows)
+                            # Re-read just the resume column for the selected rows
+                            uploaded_file.seek(0)
+                            resumes_df = pd.read_csv(
+                                uploaded_file,
+                                usecols=lambda column: column == 'Resume_str',
+                                nrows=num_rows
+                            )
+                            batch_results = run_batch(process_resumes_from_dataframe(resumes_df, api_key, num_rows, use_cache=use_cache, model=model, tpm_budget=tpm_budget))
                             if batch_results:
                                 st.session_state.processed_data.extend(batch_results)
                                 st.success(f"✅ Successfully processed {len(batch_results)} resumes!")
-                            else:
+                            elif batch_results is not None:
                                 st.error("❌ Failed to process resumes.")
                 
                 except Exception as e:
@@ -340,7 +950,7 @@ def main():
                 st.success(f"📊 Total processed resumes: {len(st.session_state.processed_data)}")
                 
                 # Display results in a table
-                results_df = pd.DataFrame(st.session_state.processed_data)
+                results_df = memoize_on_results('results_df', lambda: build_results_df(st.session_state.processed_data))
                 st.dataframe(results_df, use_container_width=True)
                 
                 # Download options
@@ -348,7 +958,7 @@ def main():
                 
                 with col1:
                     # Download as JSON
-                    json_data = json.dumps(st.session_state.processed_data, indent=2)
+                    json_data = orjson.dumps(st.session_state.processed_data, option=orjson.OPT_INDENT_2)
                     st.download_button(
                         label="📥 Download JSON",
                         data=json_data,
@@ -358,7 +968,7 @@ def main():
                 
                 with col2:
                     # Download as CSV
-                    csv_data = results_df.to_csv(index=False)
+                    csv_data = memoize_on_results('results_csv', lambda: build_results_csv(results_df))
                     st.download_button(
                         label="📥 Download CSV",
                         data=csv_data,
@@ -370,27 +980,22 @@ def main():
                     # Clear results
                     if st.button("🗑️ Clear Results"):
                         st.session_state.processed_data = []
+                        st.session_state.results_memos.clear()
                         st.rerun()
                 
                 # Summary statistics
                 st.subheader("📈 Summary Statistics")
                 if results_df is not None and not results_df.empty:
+                    stats = memoize_on_results('summary_stats', lambda: compute_summary_stats(results_df))
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        avg_experience = results_df['experience_years'].mean()
-                        st.metric("Average Experience", f"{avg_experience:.1f} years")
+                        st.metric("Average Experience", f"{stats['avg_experience']:.1f} years")
                     with col2:
-                        total_candidates = len(results_df)
-                        st.metric("Total Candidates", total_candidates)
+                        st.metric("Total Candidates", stats['total_candidates'])
                     with col3:
                         # Most common skills
-                        all_skills = []
-                        for skills_list in results_df['skills']:
-                            if isinstance(skills_list, list):
-                                all_skills.extend(skills_list)
-                        if all_skills:
-                            most_common_skill = max(set(all_skills), key=all_skills.count)
-                            st.metric("Most Common Skill", most_common_skill)
+                        if stats['most_common_skill']:
+                            st.metric("Most Common Skill", stats['most_common_skill'])
             
             else:
                 st.info("🔍 No processed resumes yet. Use the other tabs to process resumes.")